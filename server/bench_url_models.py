@@ -0,0 +1,123 @@
+"""Compare the current URL model with the hashed n-gram model: accuracy and latency.
+
+Usage: python bench_url_models.py [--data url_dataset.csv] [--hash-bits 20] [--epochs 1]
+                                  [--chunksize 100000] [--repeat 3]
+
+All models are trained on the same 70/30 split train_module uses. The hashed model is
+trained twice: through train_module's streaming path (partial_fit, --epochs passes, as
+`train_module.py --features hashed` produces it) and with SGDClassifier.fit run to
+convergence, to show what more passes would buy. Latency is reported
+per URL for single-URL calls (features + predict_proba, as a request handler would do),
+single-URL calls through SparseUrlScorer (hashed model only), batched feature
+extraction, and batched linear scoring on prepared features.
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, roc_auc_score
+from url_features import extract_features, HashedUrlFeatures, SparseUrlScorer
+from train_module import new_streaming_model, fit_chunks
+
+# Best-of-`repeat` wall time of fn(), in microseconds per item
+def per_item_us(fn, n_items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / max(n_items, 1) * 1e6
+
+def bench_baseline(urls_train, urls_test, y_train, y_test, repeat):
+    X_train = [extract_features(u) for u in urls_train]
+    model = LogisticRegression(max_iter=1000)
+    model.fit(X_train, y_train)
+
+    X_test = np.array([extract_features(u) for u in urls_test], dtype=np.float64)
+    proba = model.predict_proba(X_test)[:, 1]
+    return {
+        "model": "lexical-11 + LogisticRegression (current)",
+        "accuracy": accuracy_score(y_test, proba >= 0.5),
+        "roc_auc": roc_auc_score(y_test, proba),
+        "single_us": per_item_us(lambda: [model.predict_proba([extract_features(u)]) for u in urls_test],
+                                 len(urls_test), repeat),
+        "fast_us": None,
+        "features_us": per_item_us(lambda: [extract_features(u) for u in urls_test], len(urls_test), repeat),
+        "score_us": per_item_us(lambda: model.decision_function(X_test), len(urls_test), repeat),
+        "width": X_test.shape[1],
+    }
+
+def train_hashed_streaming(urls_train, y_train, n_features, epochs, chunksize):
+    model = new_streaming_model('hashed', n_features)
+    chunks = lambda: ((urls_train[i:i + chunksize], y_train[i:i + chunksize])
+                      for i in range(0, len(y_train), chunksize))
+    fit_chunks(model, chunks, epochs=epochs)
+    return model
+
+def train_hashed_converged(urls_train, y_train, n_features):
+    model = Pipeline([
+        ('features', HashedUrlFeatures(n_features=n_features)),
+        ('clf', SGDClassifier(loss='log_loss', alpha=1e-5, random_state=42)),
+    ])
+    model.fit(urls_train, y_train)
+    return model
+
+def bench_hashed(model, name, urls_test, y_test, repeat):
+    features, clf = model.named_steps['features'], model.named_steps['clf']
+
+    X_test = features.transform(urls_test)
+    proba = clf.predict_proba(X_test)[:, 1]
+    scorer = SparseUrlScorer(model)
+    fast = np.array([scorer.predict_proba(u) for u in urls_test])
+    return {
+        "model": name,
+        "accuracy": accuracy_score(y_test, proba >= 0.5),
+        "roc_auc": roc_auc_score(y_test, proba),
+        "single_us": per_item_us(lambda: [model.predict_proba([u]) for u in urls_test], len(urls_test), repeat),
+        "fast_us": per_item_us(lambda: [scorer.predict_proba(u) for u in urls_test], len(urls_test), repeat),
+        "fast_max_diff": float(np.abs(fast - proba).max()),
+        "features_us": per_item_us(lambda: features.transform(urls_test), len(urls_test), repeat),
+        "score_us": per_item_us(lambda: clf.decision_function(X_test), len(urls_test), repeat),
+        "width": X_test.shape[1],
+        "nnz_per_url": X_test.nnz / X_test.shape[0],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark URL classifier feature sets")
+    parser.add_argument('--data', default='url_dataset.csv')
+    parser.add_argument('--hash-bits', type=int, default=20)
+    parser.add_argument('--epochs', type=int, default=1, help="Streaming passes, as train_module --epochs")
+    parser.add_argument('--chunksize', type=int, default=100000, help="Streaming chunk size, as train_module --chunksize")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data).dropna(subset=['url', 'label'])
+    urls = df['url'].astype(str).to_numpy(dtype=object)
+    y = df['label'].to_numpy(dtype=np.int64)
+    urls_train, urls_test, y_train, y_test = train_test_split(urls, y, test_size=0.3, random_state=42)
+    print(f"{len(urls_train)} train / {len(urls_test)} test URLs from {args.data}\n")
+
+    n_features = 2 ** args.hash_bits
+    epochs = max(1, args.epochs)
+    streamed = train_hashed_streaming(urls_train, y_train, n_features, epochs, args.chunksize)
+    converged = train_hashed_converged(urls_train, y_train, n_features)
+    rows = [
+        bench_baseline(urls_train, urls_test, y_train, y_test, args.repeat),
+        bench_hashed(streamed, f"hashed + SGD, streaming ({epochs} epoch{'s' if epochs > 1 else ''})", urls_test, y_test, args.repeat),
+        bench_hashed(converged, "hashed + SGD, fit to convergence", urls_test, y_test, args.repeat),
+    ]
+
+    header = (f"{'model':<42} {'acc':>6} {'auc':>6} {'single':>9} {'fast':>9} "
+              f"{'feat/url':>9} {'score/url':>10} {'width':>8}")
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        fast = f"{r['fast_us']:.1f}us" if r['fast_us'] is not None else '-'
+        print(f"{r['model']:<42} {r['accuracy']:>6.3f} {r['roc_auc']:>6.3f} "
+              f"{r['single_us']:>7.1f}us {fast:>9} {r['features_us']:>7.1f}us {r['score_us']:>8.2f}us {r['width']:>8}")
+    print(f"\nhashed models: {rows[1]['nnz_per_url']:.0f} non-zeros per URL on average; "
+          f"SparseUrlScorer max |proba diff| vs pipeline "
+          f"{max(rows[1]['fast_max_diff'], rows[2]['fast_max_diff']):.2e}")
@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""Local index of known file hashes, with block-based fuzzy hashing for near matches.
+
+- Exact lookups: md5/sha1/sha256 digests in an SQLite B-tree (O(log n)), loaded from
+  offline threat-intel hash lists and from our own past scan verdicts.
+- Fuzzy hashing: a context-triggered piecewise hash in the style of ssdeep/spamsum,
+  implemented here (not ssdeep-compatible digests). Each signature's 7-grams are
+  indexed, so similarity search only scores samples that share a 7-gram, which
+  any pair scoring above zero must do anyway.
+
+Only the stdlib is required; numpy is used to speed up fuzzy hashing when present.
+
+CLI:
+    python hash_index.py import <list.txt> [--verdict malicious|clean] [--source NAME]
+    python hash_index.py lookup <file|hash>
+    python hash_index.py remove <file|hash> [...]
+    python hash_index.py stats
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import zlib
+import argparse
+from array import array
+from itertools import islice
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFAULT_INDEX_PATH = os.environ.get(
+    "HASH_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "hash_index.db")
+)
+
+VERDICTS = ("malicious", "clean")
+# Sources of verdicts from our own scans; every other source is a threat-intel list.
+# SCAN_SOURCE verdicts rest on heuristics only, SIGNATURE_SOURCE ones on a YARA/ClamAV hit.
+SCAN_SOURCE = "scan"
+SIGNATURE_SOURCE = "scan:signature"
+SCAN_SOURCES = (SCAN_SOURCE, SIGNATURE_SOURCE)
+# Verdicts from our own scans stop short-circuiting after this long, so files get
+# re-checked against updated YARA/ClamAV signatures.
+SCAN_VERDICT_TTL = 7 * 24 * 3600
+_SCAN_SOURCES_SQL = "(" + ", ".join(f"'{src}'" for src in SCAN_SOURCES) + ")"
+
+FUZZY_WINDOW = 7
+FUZZY_MIN_BLOCK = 3
+FUZZY_SIG_LEN = 64
+FUZZY_NGRAM = 7
+FUZZY_MAX_BYTES = 32 * 1024 * 1024
+# Bytes hashed per step; bounds the numpy working set at ~4 uint32 buffers of this length
+FUZZY_CHUNK = 1024 * 1024
+B64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+HEX_RE = re.compile(r"\b(?:[0-9a-fA-F]{64}|[0-9a-fA-F]{40}|[0-9a-fA-F]{32})\b")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS known_hashes (
+    digest TEXT PRIMARY KEY,
+    verdict TEXT NOT NULL,
+    source TEXT NOT NULL,
+    name TEXT,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fuzzy_hashes (
+    id INTEGER PRIMARY KEY,
+    fuzzy TEXT NOT NULL,
+    sha256 TEXT UNIQUE,
+    verdict TEXT NOT NULL,
+    source TEXT NOT NULL,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS fuzzy_ngrams (
+    block_size INTEGER NOT NULL,
+    ngram TEXT NOT NULL,
+    sample_id INTEGER NOT NULL,
+    PRIMARY KEY (block_size, ngram, sample_id)
+) WITHOUT ROWID;
+"""
+
+
+# -- Fuzzy hashing --------------------------------------------------------
+
+def _rolling_chunks(data: bytes):
+    """Yield (offset, rolls) for consecutive FUZZY_CHUNK-byte windows of ``data``, where
+    rolls[i] is the rolling hash over the FUZZY_WINDOW bytes ending at offset + i
+    (spamsum's roll). ``rolls`` is a reused buffer, valid until the next step, so memory
+    stays bounded whatever the file size."""
+    if NUMPY_AVAILABLE and len(data) > 4096:
+        w = FUZZY_WINDOW
+        size = min(FUZZY_CHUNK, len(data))
+        # The window's bytes, preceded by the last w - 1 bytes of the previous window
+        padded = np.zeros(size + w - 1, dtype=np.uint32)
+        total = np.empty(size, dtype=np.uint32)
+        mixed = np.empty(size, dtype=np.uint32)
+        term = np.empty(size, dtype=np.uint32)
+        for offset in range(0, len(data), FUZZY_CHUNK):
+            m = min(size, len(data) - offset)
+            padded[w - 1:w - 1 + m] = np.frombuffer(data, dtype=np.uint8, count=m, offset=offset)
+            s, x, t = total[:m], mixed[:m], term[:m]
+            s.fill(0)
+            x.fill(0)
+            for k in range(w):
+                shifted = padded[w - 1 - k:w - 1 - k + m]
+                # h1 + h2 weight the byte k places back by 1 + (w - k); h3 xors it in << 5k
+                np.multiply(shifted, np.uint32(w - k + 1), out=t)
+                s += t
+                np.left_shift(shifted, np.uint32(5 * k), out=t)
+                x ^= t
+            s += x
+            yield offset, s
+            padded[:w - 1] = padded[m:m + w - 1]
+        return
+
+    window = [0] * FUZZY_WINDOW
+    h1 = h2 = h3 = 0
+    for offset in range(0, len(data), FUZZY_CHUNK):
+        chunk = data[offset:offset + FUZZY_CHUNK]
+        out = array("I", bytes(4 * len(chunk)))
+        for j, b in enumerate(chunk):
+            i = offset + j
+            h2 = h2 - h1 + FUZZY_WINDOW * b
+            h1 = h1 + b - window[i % FUZZY_WINDOW]
+            window[i % FUZZY_WINDOW] = b
+            h3 = ((h3 << 5) ^ b) & 0xFFFFFFFF
+            out[j] = (h1 + h2 + h3) & 0xFFFFFFFF
+        yield offset, out
+
+
+def _trigger_points(data, block_sizes, limit):
+    """{block_size: first ``limit`` offsets where the rolling hash triggers a piece boundary},
+    for every block size in one pass; stops reading once each size has ``limit``."""
+    points = {bs: [] for bs in block_sizes}
+    for offset, rolls in _rolling_chunks(data):
+        active = [bs for bs in block_sizes if len(points[bs]) < limit]
+        if not active:
+            break
+        for bs in active:
+            need = limit - len(points[bs])
+            if isinstance(rolls, array):
+                hits = islice((offset + i for i, r in enumerate(rolls) if r % bs == bs - 1), need)
+                points[bs].extend(hits)
+            else:
+                hits = np.flatnonzero(rolls % np.uint32(bs) == bs - 1)[:need]
+                points[bs].extend((hits + offset).tolist())
+    return points
+
+
+def _signature(data, triggers, max_len):
+    sig = []
+    start = 0
+    for i in triggers:
+        if len(sig) >= max_len - 1:
+            break
+        sig.append(B64[zlib.crc32(data[start:i + 1]) & 63])
+        start = i + 1
+    if start < len(data):
+        sig.append(B64[zlib.crc32(data[start:]) & 63])
+    return "".join(sig)
+
+
+def fuzzy_hash(data: bytes) -> str:
+    """Return a '<block_size>:<sig>:<sig at 2x block_size>' fuzzy hash of ``data``."""
+    block_size = FUZZY_MIN_BLOCK
+    while block_size * FUZZY_SIG_LEN < len(data):
+        block_size *= 2
+    # Every block size the loop below may try, and its double
+    sizes = set()
+    bs = block_size
+    while bs >= FUZZY_MIN_BLOCK:
+        sizes.update((bs, bs * 2))
+        bs //= 2
+    # A signature never uses more than FUZZY_SIG_LEN - 1 trigger points
+    points = _trigger_points(data, sorted(sizes), FUZZY_SIG_LEN - 1)
+    while True:
+        sig1 = _signature(data, points[block_size], FUZZY_SIG_LEN)
+        sig2 = _signature(data, points[block_size * 2], FUZZY_SIG_LEN // 2)
+        # Too few trigger points at this block size: retry with a smaller one
+        if len(sig1) >= FUZZY_SIG_LEN // 2 or block_size <= FUZZY_MIN_BLOCK:
+            return f"{block_size}:{sig1}:{sig2}"
+        block_size //= 2
+
+
+def fuzzy_hash_file(file_path, max_bytes=FUZZY_MAX_BYTES):
+    with open(file_path, "rb") as f:
+        return fuzzy_hash(f.read(max_bytes))
+
+
+def _parse_fuzzy(h):
+    bs, sig1, sig2 = h.split(":", 2)
+    return int(bs), sig1, sig2
+
+
+def _squeeze(sig):
+    # Runs of more than 3 identical characters carry little information (ssdeep does the same)
+    return re.sub(r"(.)\1{3,}", r"\1\1\1", sig)
+
+
+def _ngrams(sig):
+    return {sig[i:i + FUZZY_NGRAM] for i in range(len(sig) - FUZZY_NGRAM + 1)}
+
+
+def _lcs_len(a, b):
+    prev = [0] * (len(b) + 1)
+    for ca in a:
+        cur = [0]
+        for j, cb in enumerate(b):
+            cur.append(prev[j] + 1 if ca == cb else max(prev[j + 1], cur[j]))
+        prev = cur
+    return prev[-1]
+
+
+def _score_sigs(a, b, block_size):
+    if not a or not b or not (_ngrams(a) & _ngrams(b)):
+        return 0
+    # Insert/delete edit distance, scaled to 0-100
+    dist = len(a) + len(b) - 2 * _lcs_len(a, b)
+    score = 100 - (100 * dist) // (len(a) + len(b))
+    # Short signatures at small block sizes match too easily; cap them
+    return min(score, block_size // FUZZY_MIN_BLOCK * min(len(a), len(b)))
+
+
+def fuzzy_compare(h1: str, h2: str) -> int:
+    """Similarity of two fuzzy hashes, 0 (unrelated) to 100 (identical)."""
+    bs1, a1, a2 = _parse_fuzzy(h1)
+    bs2, b1, b2 = _parse_fuzzy(h2)
+    if bs1 == bs2 and a1 == b1 and a2 == b2:
+        return 100
+    a1, a2, b1, b2 = map(_squeeze, (a1, a2, b1, b2))
+    if bs1 == bs2:
+        return max(_score_sigs(a1, b1, bs1), _score_sigs(a2, b2, bs1 * 2))
+    if bs1 == bs2 * 2:
+        return _score_sigs(a1, b2, bs1)
+    if bs2 == bs1 * 2:
+        return _score_sigs(a2, b1, bs2)
+    return 0
+
+
+def _fuzzy_index_keys(h):
+    """(block_size, 7-gram) keys for both signatures of a fuzzy hash."""
+    bs, sig1, sig2 = _parse_fuzzy(h)
+    keys = {(bs, g) for g in _ngrams(_squeeze(sig1))}
+    keys |= {(bs * 2, g) for g in _ngrams(_squeeze(sig2))}
+    return keys
+
+
+# -- Index ----------------------------------------------------------------
+
+def trusted_malicious(entry):
+    """True for malicious verdicts from threat intel or backed by a YARA/ClamAV hit."""
+    return entry.get("verdict") == "malicious" and (
+        entry.get("source") not in SCAN_SOURCES or entry.get("source") == SIGNATURE_SOURCE
+    )
+
+
+class HashIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_hashes(self, entries, verdict, source):
+        """Upsert (digest, name) pairs.
+
+        Our own scans never overwrite a threat-intel entry, and a threat-intel malicious
+        verdict is not downgraded by a clean list (use remove for that). Anything else,
+        including scan verdicts, is replaced by the newer entry.
+        """
+        if verdict not in VERDICTS:
+            raise ValueError(f"verdict must be one of {VERDICTS}")
+        now = time.time()
+        rows = ((d.lower(), verdict, source, name, now) for d, name in entries)
+        with self.conn:
+            cur = self.conn.executemany(
+                f"""INSERT INTO known_hashes (digest, verdict, source, name, updated)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(digest) DO UPDATE SET
+                       verdict = excluded.verdict,
+                       source = excluded.source,
+                       name = COALESCE(excluded.name, known_hashes.name),
+                       updated = excluded.updated
+                   WHERE known_hashes.source IN {_SCAN_SOURCES_SQL}
+                      OR (excluded.source NOT IN {_SCAN_SOURCES_SQL}
+                          AND NOT (known_hashes.verdict = 'malicious' AND excluded.verdict = 'clean'))""",
+                rows,
+            )
+        return cur.rowcount
+
+    def remove(self, digests):
+        """Delete entries (any source) and the fuzzy hashes of matching sha256s; returns rows removed."""
+        digests = [d.lower() for d in digests if d]
+        if not digests:
+            return 0
+        marks = ",".join("?" * len(digests))
+        with self.conn:
+            n = self.conn.execute(f"DELETE FROM known_hashes WHERE digest IN ({marks})", digests).rowcount
+            ids = [r[0] for r in self.conn.execute(f"SELECT id FROM fuzzy_hashes WHERE sha256 IN ({marks})", digests)]
+            if ids:
+                id_marks = ",".join("?" * len(ids))
+                self.conn.execute(f"DELETE FROM fuzzy_ngrams WHERE sample_id IN ({id_marks})", ids)
+                self.conn.execute(f"DELETE FROM fuzzy_hashes WHERE id IN ({id_marks})", ids)
+        return n
+
+    def import_file(self, list_path, verdict="malicious", source=None):
+        """Load a threat-intel hash list: one md5/sha1/sha256 per line, optionally with
+        a name after it (plain lists, CSV exports); '#' lines are comments."""
+        source = source or os.path.basename(list_path)
+
+        def entries():
+            with open(list_path, encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    m = HEX_RE.search(line)
+                    if not m:
+                        continue
+                    rest = line[m.end():].strip(" \t,;\"'")
+                    yield m.group(0), (rest[:200] or None)
+
+        return self.add_hashes(entries(), verdict, source)
+
+    def lookup(self, digests):
+        digests = [d.lower() for d in digests if d]
+        if not digests:
+            return []
+        marks = ",".join("?" * len(digests))
+        cur = self.conn.execute(
+            f"SELECT digest, verdict, source, name, updated FROM known_hashes WHERE digest IN ({marks})",
+            digests,
+        )
+        return [dict(r) for r in cur]
+
+    def known_verdict(self, hashes):
+        """Decisive entry for a {algo: digest} dict, or None if the sample must be scanned."""
+        fresh = time.time() - SCAN_VERDICT_TTL
+        rows = [r for r in self.lookup(hashes.values())
+                if r["source"] not in SCAN_SOURCES or r["updated"] >= fresh]
+        # Heuristic-only malicious verdicts from our own scans never skip a scan
+        bad = [r for r in rows if trusted_malicious(r)]
+        if bad:
+            return bad[0]
+        good = [r for r in rows if r["verdict"] == "clean"]
+        return good[0] if good else None
+
+    def add_fuzzy(self, fuzzy, sha256, verdict, source, name=None):
+        with self.conn:
+            self.conn.execute(
+                """INSERT INTO fuzzy_hashes (fuzzy, sha256, verdict, source, name)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(sha256) DO UPDATE SET
+                       verdict = excluded.verdict,
+                       source = excluded.source,
+                       name = COALESCE(excluded.name, fuzzy_hashes.name)""",
+                (fuzzy, sha256, verdict, source, name),
+            )
+            sample_id = self.conn.execute(
+                "SELECT id FROM fuzzy_hashes WHERE sha256 = ?", (sha256,)
+            ).fetchone()[0]
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO fuzzy_ngrams (block_size, ngram, sample_id) VALUES (?, ?, ?)",
+                ((bs, g, sample_id) for bs, g in _fuzzy_index_keys(fuzzy)),
+            )
+
+    def similar(self, fuzzy, min_score=50, limit=10, exclude_sha256=None, max_candidates=200):
+        """Indexed samples whose fuzzy hash scores >= min_score against ``fuzzy``, best first."""
+        keys = list(_fuzzy_index_keys(fuzzy))
+        if not keys:
+            return []
+        counts = {}
+        # Batch the key lookups to stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 200):
+            batch = keys[i:i + 200]
+            where = " OR ".join("(block_size = ? AND ngram = ?)" for _ in batch)
+            params = [v for key in batch for v in key]
+            for (sample_id,) in self.conn.execute(f"SELECT sample_id FROM fuzzy_ngrams WHERE {where}", params):
+                counts[sample_id] = counts.get(sample_id, 0) + 1
+        candidates = sorted(counts, key=counts.get, reverse=True)[:max_candidates]
+
+        matches = []
+        for i in range(0, len(candidates), 500):
+            batch = candidates[i:i + 500]
+            # The exact-hash entry (e.g. from a threat-intel list added later) takes precedence
+            cur = self.conn.execute(
+                f"""SELECT f.fuzzy, f.sha256, COALESCE(k.source, f.source) AS source, f.name,
+                           COALESCE(k.verdict, f.verdict) AS verdict
+                    FROM fuzzy_hashes f LEFT JOIN known_hashes k ON k.digest = f.sha256
+                    WHERE f.id IN ({','.join('?' * len(batch))})""",
+                batch,
+            )
+            for r in cur:
+                if exclude_sha256 and r["sha256"] == exclude_sha256:
+                    continue
+                score = fuzzy_compare(fuzzy, r["fuzzy"])
+                if score >= min_score:
+                    matches.append({**dict(r), "score": score})
+        matches.sort(key=lambda m: m["score"], reverse=True)
+        return matches[:limit]
+
+    def record_scan(self, hashes, fuzzy, verdict, name=None, source=SCAN_SOURCE):
+        """Store our own verdict for a scanned sample (exact hashes and fuzzy hash).
+        ``source`` is SIGNATURE_SOURCE when the verdict rests on a YARA/ClamAV hit."""
+        if source not in SCAN_SOURCES:
+            raise ValueError(f"source must be one of {SCAN_SOURCES}")
+        self.add_hashes(((d, name) for d in hashes.values()), verdict, source)
+        if fuzzy:
+            self.add_fuzzy(fuzzy, hashes["sha256"], verdict, source, name)
+
+    def stats(self):
+        q = self.conn.execute
+        return {
+            "known_hashes": dict(q("SELECT verdict, COUNT(*) FROM known_hashes GROUP BY verdict").fetchall()),
+            "fuzzy_hashes": q("SELECT COUNT(*) FROM fuzzy_hashes").fetchone()[0],
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local known-hash index")
+    parser.add_argument("--db", default=DEFAULT_INDEX_PATH)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_import = sub.add_parser("import", help="Load a hash list")
+    p_import.add_argument("path")
+    p_import.add_argument("--verdict", choices=VERDICTS, default="malicious")
+    p_import.add_argument("--source")
+    p_lookup = sub.add_parser("lookup", help="Look up a file or a hash")
+    p_lookup.add_argument("target")
+    p_remove = sub.add_parser("remove", help="Delete entries, e.g. a false positive from our own scans "
+                                             "(pass the file, or each of its md5/sha1/sha256)")
+    p_remove.add_argument("targets", nargs="+")
+    sub.add_parser("stats")
+    args = parser.parse_args()
+
+    with HashIndex(args.db) as index:
+        if args.cmd == "import":
+            n = index.import_file(args.path, args.verdict, args.source)
+            out = {"imported": n, "source": args.source or os.path.basename(args.path)}
+        elif args.cmd == "lookup":
+            if os.path.isfile(args.target):
+                from scanner import calculate_hash
+                fuzzy = fuzzy_hash_file(args.target)
+                hashes = calculate_hash(args.target)
+                out = {"hashes": hashes, "fuzzy_hash": fuzzy,
+                       "known": index.lookup(hashes.values()),
+                       "similar": index.similar(fuzzy, exclude_sha256=hashes["sha256"])}
+            else:
+                out = {"known": index.lookup([args.target])}
+        elif args.cmd == "remove":
+            digests = []
+            for target in args.targets:
+                if os.path.isfile(target):
+                    from scanner import calculate_hash
+                    digests.extend(calculate_hash(target).values())
+                else:
+                    digests.append(target)
+            out = {"removed": index.remove(digests)}
+        else:
+            out = index.stats()
+    print(json.dumps(out))
+    sys.exit(0)
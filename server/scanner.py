@@ -15,6 +15,13 @@ try:
 except ImportError:
     PEFILE_AVAILABLE = False
 
+from hash_index import (HashIndex, fuzzy_hash_file, trusted_malicious, DEFAULT_INDEX_PATH,
+                        SCAN_SOURCE, SIGNATURE_SOURCE)
+
+# A near match this close to a known-malicious sample (a repacked or patched variant)
+# is enough on its own for a malicious (MEDIUM) verdict
+NEAR_MATCH_SCORE = 90
+
 
 def calculate_hash(file_path):
     sha256_hash = hashlib.sha256()
@@ -188,7 +195,41 @@ def analyze_file_type(file_path):
         return {"error": f"file utility error: {e}"}
 
 
-def perform_scan(file_path, file_name, yara_rules_path="malware_rules.yar"):
+def open_hash_index(index_path=DEFAULT_INDEX_PATH):
+    if not index_path:
+        return None, {"warning": "hash index disabled"}
+    try:
+        return HashIndex(index_path), {}
+    except Exception as e:
+        return None, {"error": f"Hash index error: {e}"}
+
+
+def known_sample_result(results, hashes, known, t0):
+    """Short-circuit result for a sample whose hash is already in the index."""
+    malicious = known["verdict"] == "malicious"
+    skipped = {"skipped": True, "reason": "known sample"}
+    results.update({
+        "file_type_info": skipped,
+        "strings_sample": [],
+        "urls_extracted": [],
+        "pe_analysis": skipped,
+        "yara": skipped,
+        "clamav": skipped,
+        "hashes": hashes,
+        "known_sample": known,
+        "risk_score": 100 if malicious else 0,
+        "threat_level": "HIGH" if malicious else "SAFE",
+        "malicious": malicious,
+        "analysis_time_sec": round(time.time() - t0, 3),
+    })
+    results["indicators"] = {
+        "known_sample_verdict": known["verdict"],
+        "known_sample_source": known["source"],
+    }
+    return results
+
+
+def perform_scan(file_path, file_name, yara_rules_path="malware_rules.yar", index_path=DEFAULT_INDEX_PATH):
     t0 = time.time()
     size_bytes = os.path.getsize(file_path)
 
@@ -204,6 +245,29 @@ def perform_scan(file_path, file_name, yara_rules_path="malware_rules.yar"):
         "extension": os.path.splitext(file_name)[1].lower(),
     }
 
+    # Known-hash lookup: skip the full analysis for samples with a decisive verdict
+    index, index_status = open_hash_index(index_path)
+    if index_status:
+        results["hash_index"] = index_status
+    if index is not None:
+        try:
+            known = index.known_verdict(hashes)
+            if known:
+                index.close()
+                return known_sample_result(results, hashes, known, t0)
+        except Exception as e:
+            results["hash_index"] = {"error": f"Hash index error: {e}"}
+
+    # Fuzzy hash and near matches (e.g. repacked variants of samples already seen)
+    similar = []
+    try:
+        results["fuzzy_hash"] = fuzzy_hash_file(file_path)
+        if index is not None:
+            similar = index.similar(results["fuzzy_hash"], exclude_sha256=hashes["sha256"])
+    except Exception as e:
+        results["fuzzy_hash_error"] = str(e)
+    results["similar_samples"] = similar
+
     # Type info
     results["file_type_info"] = analyze_file_type(file_path)
 
@@ -251,6 +315,16 @@ def perform_scan(file_path, file_name, yara_rules_path="malware_rules.yar"):
         score += 10
     if size_bytes > 50 * 1024 * 1024:  # very large
         score += 5
+    # Only lookalikes of threat-intel or signature-confirmed samples raise the score,
+    # so heuristic verdicts can't propagate through similarity
+    similar_malicious = [m for m in similar if trusted_malicious(m)]
+    signature_hit = clam_status == "infected" or bool(yara_matches)
+    # Verdict the file earns on its own, without the similarity boost
+    verdict_alone = min(100, score) >= 50 or signature_hit
+    if similar_malicious:
+        score += 30
+        if similar_malicious[0]["score"] >= NEAR_MATCH_SCORE:
+            score = max(score, 50)
 
     score = max(0, min(100, score))
     level = "HIGH" if score >= 80 else "MEDIUM" if score >= 50 else "LOW" if score >= 20 else "SAFE"
@@ -258,7 +332,7 @@ def perform_scan(file_path, file_name, yara_rules_path="malware_rules.yar"):
     results["hashes"] = hashes
     results["risk_score"] = score
     results["threat_level"] = level
-    results["malicious"] = score >= 50 or clam_status == "infected" or bool(yara_matches)
+    results["malicious"] = score >= 50 or signature_hit
     results["analysis_time_sec"] = round(time.time() - t0, 3)
 
     # Indicators summary
@@ -269,8 +343,26 @@ def perform_scan(file_path, file_name, yara_rules_path="malware_rules.yar"):
         "suspicious_imports_count": pe.get("num_suspicious_imports", 0),
         "suspicious_sections_count": len(pe.get("suspicious_sections", [])) if isinstance(pe.get("suspicious_sections"), list) else 0,
         "urls_found": len(results.get("urls_extracted", [])),
+        "similar_malicious_count": len(similar_malicious),
     }
 
+    # Remember this verdict so future scans of the same or similar samples can use it.
+    # Not when the file resembles known-malicious samples but isn't malicious on its own:
+    # a verdict only the similarity boost produced could spread a false positive to the
+    # lookalikes of this file, and a clean one would cut later scans short and hide the match.
+    if index is not None:
+        try:
+            if similar_malicious and not verdict_alone:
+                results["hash_index"] = {"note": "verdict not recorded: similar to known malicious samples"}
+            else:
+                index.record_scan(hashes, results.get("fuzzy_hash"),
+                                  "malicious" if results["malicious"] else "clean", file_name,
+                                  source=SIGNATURE_SOURCE if signature_hit else SCAN_SOURCE)
+        except Exception as e:
+            results["hash_index"] = {"error": f"Hash index error: {e}"}
+        finally:
+            index.close()
+
     return results
 
 
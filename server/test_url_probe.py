@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Tests for url_probe against a local HTTP server and a StaticResolver.
+
+Run from server/: python -m unittest test_url_probe
+"""
+
+import time
+import socket
+import asyncio
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import url_probe
+from url_probe import Prober, StaticResolver, open_tcp_connection
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled connections can be reused
+
+    def _reply(self, status, headers=()):
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        port = self.server.server_address[1]
+        if self.path == "/slow":
+            time.sleep(2)
+            self._reply(200)
+        elif self.path == "/redirect":
+            self._reply(302, [("Location", "/ok")])
+        elif self.path == "/offhost":
+            self._reply(301, [("Location", f"http://other.test:{port}/ok")])
+        elif self.path == "/loop":
+            self._reply(302, [("Location", "/loop")])
+        elif self.path == "/missing":
+            self._reply(404)
+        else:
+            self._reply(200)
+
+    do_GET = do_HEAD
+
+    def log_message(self, *args):
+        pass
+
+
+class ProberTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.daemon_threads = True
+        cls.port = cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.connects = 0
+
+    async def _connector(self, ip, port, ssl_context=None, server_hostname=None):
+        self.connects += 1
+        return await open_tcp_connection(ip, port, ssl_context, server_hostname)
+
+    def prober(self, **kwargs):
+        resolver = StaticResolver({"site.test": ["127.0.0.1"], "other.test": ["127.0.0.1"]})
+        kwargs.setdefault("timeout", 3.0)
+        return Prober(resolver=resolver, connector=self._connector, **kwargs)
+
+    def url(self, path, host="site.test"):
+        return f"http://{host}:{self.port}{path}"
+
+    def scan(self, urls, **kwargs):
+        return asyncio.run(self.prober(**kwargs).scan_many(urls))
+
+    def test_status(self):
+        ok, missing = self.scan([self.url("/ok"), self.url("/missing")])
+        self.assertEqual(ok["resolved_ips"], ["127.0.0.1"])
+        self.assertEqual(ok["liveness_check"], {"is_live": True, "status_code": 200})
+        self.assertEqual(missing["liveness_check"],
+                         {"is_live": True, "status_code": 404, "note": "HTTPError on HEAD"})
+
+    def test_redirects(self):
+        same, off, loop = self.scan([self.url("/redirect"), self.url("/offhost"), self.url("/loop")])
+        self.assertEqual(same["liveness_check"],
+                         {"is_live": True, "status_code": 200, "final_url": self.url("/ok")})
+        self.assertEqual(off["liveness_check"]["final_url"], self.url("/ok", host="other.test"))
+        self.assertEqual(loop["liveness_check"]["status_code"], 302)
+        self.assertEqual(loop["liveness_check"]["note"], "HTTPError on HEAD")
+
+    def test_timeout(self):
+        result, = self.scan([self.url("/slow")], timeout=0.5)
+        self.assertEqual(result["liveness_check"],
+                         {"is_live": False, "status_code": None, "error": "timed out after 0.5s"})
+
+    def test_dns_failure(self):
+        result, = self.scan([self.url("/ok", host="nowhere.test")])
+        self.assertEqual(result["resolved_ips"], [])
+        self.assertEqual(result["liveness_check"]["error"], "DNS resolution failed")
+
+    def test_malformed_url_does_not_abort_batch(self):
+        bad, good = self.scan(["http://[::1/x", self.url("/ok")])
+        self.assertEqual(bad["resolved_ips"], [])
+        self.assertFalse(bad["liveness_check"]["is_live"])
+        self.assertIn("error", bad["liveness_check"])
+        self.assertTrue(good["liveness_check"]["is_live"])
+
+    def test_connection_reuse(self):
+        results = self.scan([self.url(f"/ok?{i}") for i in range(5)], per_host=1)
+        self.assertTrue(all(r["liveness_check"]["is_live"] for r in results))
+        self.assertEqual(self.connects, 1)
+
+    def test_busy_host_does_not_hold_global_slots(self):
+        async def run():
+            prober = self.prober(concurrency=2, per_host=1)
+            slow = [asyncio.ensure_future(prober.scan_one(self.url("/slow"))) for _ in range(3)]
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            await prober.scan_one(self.url("/ok", host="other.test"))
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*slow)
+            prober.close()
+            return elapsed
+
+        self.assertLess(asyncio.run(run()), 1.0)
+
+
+class SystemResolverTest(unittest.TestCase):
+    def test_slow_lookups_do_not_fail_healthy_hosts(self):
+        def getaddrinfo(host, port, *args, **kwargs):
+            time.sleep(1.0 if host.startswith("slow") else 0.02)
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 0))]
+
+        async def run():
+            prober = Prober(dns_timeout=0.5)
+            try:
+                return await asyncio.gather(*(prober.resolve_ips(h) for h in hosts))
+            finally:
+                prober.close()
+
+        # More slow lookups than asyncio's default executor has threads
+        hosts = [f"slow{i}.test" for i in range(40)] + [f"ok{i}.test" for i in range(50)]
+        with mock.patch.object(url_probe.socket, "getaddrinfo", getaddrinfo):
+            results = asyncio.run(run())
+        self.assertEqual(results[:40], [[]] * 40)
+        self.assertEqual(results[40:], [["10.0.0.1"]] * 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
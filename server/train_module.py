@@ -1,140 +1,172 @@
-import tldextract
-from urllib.parse import urlparse
-from sklearn.linear_model import LogisticRegression
+import argparse
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
+import numpy as np
+import scipy.sparse as sp
 import pandas as pd
 import joblib
-
-# List of suspicious words commonly found in phishing URLs
-suspicious_words = ['login', 'secure', 'verify', 'account', 'update', 'bank', 'password', 'admin']
-
-# Function to extract features from the URL for analysis
-def extract_features(url):
-    features = []
-    
-    # Feature 1: Length of the URL
-    features.append(len(url))
-    
-    # Feature 2: Number of dots in the domain
-    domain_info = tldextract.extract(url)
-    features.append(domain_info.subdomain.count('.') + domain_info.domain.count('.'))
-    
-    # Feature 3: Check for suspicious words in the URL
-    if any(word in url.lower() for word in suspicious_words):
-        features.append(1)
+from url_features import extract_features, extract_features_batch, is_parseable, HashedUrlFeatures
+
+CLASSES = np.array([0, 1])
+
+# Split a chunk across worker processes for feature extraction
+def extract_features_parallel(urls, parallel, n_jobs, extract=extract_features_batch):
+    if n_jobs == 1 or len(urls) < 2 * n_jobs:
+        return extract(urls)
+    parts = np.array_split(np.asarray(urls, dtype=object), n_jobs)
+    results = parallel(joblib.delayed(extract)(p) for p in parts if len(p))
+    if isinstance(results[0], tuple):
+        # HashedUrlFeatures.extract: (sparse n-grams, dense lexical)
+        return sp.vstack([r[0] for r in results], format='csr'), np.vstack([r[1] for r in results])
+    return np.vstack(results)
+
+# Read (url, label) chunks from the dataset without loading it all. Rows whose URL urlparse
+# rejects are dropped and counted in stats['malformed'] when a stats dict is given.
+def iter_chunks(csv_path, chunksize, stats=None):
+    for chunk in pd.read_csv(csv_path, usecols=['url', 'label'], dtype={'url': str}, chunksize=chunksize):
+        chunk = chunk.dropna(subset=['url', 'label'])
+        chunk = chunk[chunk['url'].str.len() > 0]
+        ok = chunk['url'].map(is_parseable)
+        if stats is not None:
+            stats['malformed'] = stats.get('malformed', 0) + int((~ok).sum())
+        chunk = chunk[ok]
+        if len(chunk):
+            yield chunk['url'].to_numpy(), chunk['label'].to_numpy(dtype=np.int64)
+
+# Original in-memory training: whole CSV, LogisticRegression, 70/30 split
+def train_in_memory(csv_path, model_path):
+    df = pd.read_csv(csv_path)
+
+    # Extract features and labels
+    X = df['url'].apply(extract_features).tolist()
+    y = df['label'].tolist()
+
+    # Split the dataset into training and testing sets
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+
+    # Train the logistic regression model
+    model = LogisticRegression(max_iter=1000)
+    model.fit(X_train, y_train)
+
+    # Evaluate the model
+    y_pred = model.predict(X_test)
+    print(f"Accuracy: {accuracy_score(y_test, y_pred)}")
+    print(classification_report(y_test, y_pred))
+
+    # Save the trained model to a file
+    joblib.dump(model, model_path)
+
+def new_streaming_model(features='lexical', n_features=2 ** 20):
+    clf = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=42)
+    if features == 'hashed':
+        # Takes raw URL strings: hashed n-grams + scaled lexical features
+        return Pipeline([('features', HashedUrlFeatures(n_features=n_features)), ('clf', clf)])
+    return Pipeline([('scaler', StandardScaler()), ('clf', clf)])
+
+# Load the previous artifact for warm-starting; only a streaming pipeline can be continued
+def load_warm_start(model_path):
+    try:
+        model = joblib.load(model_path)
+    except FileNotFoundError:
+        print(f"No artifact at {model_path}; training from scratch")
+        return None
+    if isinstance(model, Pipeline) and hasattr(model.named_steps.get('clf'), 'partial_fit'):
+        return model
+    print(f"{model_path} holds a {type(model).__name__}, which cannot be updated incrementally; training from scratch")
+    return None
+
+# Update a streaming pipeline with partial_fit over the (urls, labels) chunks from chunk_source(),
+# a callable so that each epoch can re-read them. Chunks are scored before they are trained on
+# (progressive validation) whenever the model is already fitted.
+def fit_chunks(model, chunk_source, n_jobs=1, epochs=1, fitted=False):
+    prep, clf = model.steps[0][1], model.named_steps['clf']
+    hashed = isinstance(prep, HashedUrlFeatures)
+    if hashed:
+        extract, update, to_matrix = prep.extract, prep.update, prep.combine
     else:
-        features.append(0)
-
-    # Feature 4: Check if HTTPS is used (HTTPS adds a layer of security)
-    if urlparse(url).scheme == "https":
-        features.append(0)
+        extract, update, to_matrix = extract_features_batch, prep.partial_fit, prep.transform
+    n_jobs = joblib.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    rng = np.random.RandomState(42)
+
+    y_true, y_pred = [], []
+    rows = 0
+    with joblib.Parallel(n_jobs=n_jobs) as parallel:
+        for epoch in range(epochs):
+            for urls, y in chunk_source():
+                raw = extract_features_parallel(urls, parallel, n_jobs, extract)
+                # Shuffle within the chunk so label-sorted files don't bias SGD
+                order = rng.permutation(len(y))
+                raw = tuple(r[order] for r in raw) if hashed else raw[order]
+                y = y[order]
+
+                if fitted and epoch == 0:
+                    y_true.append(y)
+                    y_pred.append(clf.predict(to_matrix(raw)))
+
+                update(raw)
+                clf.partial_fit(to_matrix(raw), y, classes=CLASSES)
+                fitted = True
+                rows += len(y)
+    return rows, y_true, y_pred
+
+# Out-of-core training: read the CSV in chunks and update the model with partial_fit.
+# features / n_features default to lexical / 2**20 for a new model and to the artifact's own
+# settings when warm-starting; asking for different ones than the artifact has is an error.
+def train_streaming(csv_path, model_path, chunksize=100000, n_jobs=1, warm_start=False, epochs=1,
+                    features=None, n_features=None):
+    model = load_warm_start(model_path) if warm_start else None
+    fitted = model is not None
+    if model is None:
+        model = new_streaming_model(features or 'lexical', n_features or 2 ** 20)
     else:
-        features.append(1)
-    
-    return features
-
-# Load dataset
-df = pd.read_csv('url_dataset.csv')
-
-# Extract features and labels
-X = df['url'].apply(extract_features).tolist()
-y = df['label'].tolist()
-
-# Split the dataset into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-
-# Train the logistic regression model
-model = LogisticRegression(max_iter=1000)
-model.fit(X_train, y_train)
-
-# Evaluate the model
-y_pred = model.predict(X_test)
-print(f"Accuracy: {accuracy_score(y_test, y_pred)}")
-print(classification_report(y_test, y_pred))
-
-# Save the trained model to a file
-joblib.dump(model, 'url_classifier_model.pkl')
-from urllib.parse import urlparse
-import re
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
-import pandas as pd
-import joblib
-
-# List of suspicious words commonly found in phishing URLs
-suspicious_words = ['login', 'secure', 'verify', 'account', 'update', 'bank', 'password', 'admin']
-
-# Function to check if the URL contains an IP address
-def has_ip_address(url):
-    ip_pattern = re.compile(r'(\d{1,3}\.){3}\d{1,3}')
-    return 1 if ip_pattern.search(url) else 0
-
-# Function to extract features from the URL for analysis
-def extract_features(url):
-    features = []
-    
-    # Feature 1: Length of the URL
-    features.append(len(url))
-    
-    # Feature 2: Number of dots in the domain
-    domain_info = tldextract.extract(url)
-    features.append(domain_info.subdomain.count('.') + domain_info.domain.count('.'))
-    
-    # Feature 3: Check for suspicious words in the URL
-    if any(word in url.lower() for word in suspicious_words):
-        features.append(1)
-    else:
-        features.append(0)
-
-    # Feature 4: Check if HTTPS is used (HTTPS adds a layer of security)
-    if urlparse(url).scheme == "https":
-        features.append(0)
+        prep = model.steps[0][1]
+        loaded = 'hashed' if isinstance(prep, HashedUrlFeatures) else 'lexical'
+        if features and features != loaded:
+            raise SystemExit(f"{model_path} is a {loaded} model; cannot warm-start it with --features {features}")
+        if n_features and (loaded != 'hashed' or n_features != prep.n_features):
+            have = f"2**{prep.n_features.bit_length() - 1} hashed features" if loaded == 'hashed' else "no hashed features"
+            raise SystemExit(f"{model_path} has {have}; cannot warm-start it with --hash-bits {n_features.bit_length() - 1}")
+
+    stats = {}
+    rows, y_true, y_pred = fit_chunks(model, lambda: iter_chunks(csv_path, chunksize, stats),
+                                      n_jobs=n_jobs, epochs=epochs, fitted=fitted)
+    if not rows:
+        raise SystemExit(f"No labeled rows found in {csv_path}")
+
+    print(f"Trained on {rows} rows ({epochs} epoch(s))")
+    if stats.get('malformed'):
+        # Every epoch re-reads the file, so each pass skips the same rows
+        print(f"Skipped {stats['malformed'] // epochs} rows with malformed URLs")
+    if y_true:
+        y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+        print(f"Progressive accuracy: {accuracy_score(y_true, y_pred)}")
+        print(classification_report(y_true, y_pred, zero_division=0))
+
+    joblib.dump(model, model_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the URL classifier")
+    parser.add_argument('--data', default='url_dataset.csv', help="CSV with url,label columns")
+    parser.add_argument('--model', default='url_classifier_model.pkl', help="Model artifact path")
+    parser.add_argument('--stream', action='store_true', help="Out-of-core training with SGDClassifier.partial_fit")
+    parser.add_argument('--chunksize', type=int, default=100000, help="Rows per chunk in --stream mode")
+    parser.add_argument('--jobs', type=int, default=1, help="Feature extraction processes in --stream mode (-1 = all cores)")
+    parser.add_argument('--warm-start', action='store_true', help="Continue training the existing --model artifact")
+    parser.add_argument('--epochs', type=int, default=1, help="Passes over the data in --stream mode")
+    parser.add_argument('--features', choices=['lexical', 'hashed'],
+                        help="--stream feature set: 11 lexical features (default), or hashed n-grams + lexical; "
+                             "with --warm-start, defaults to the artifact's")
+    parser.add_argument('--hash-bits', type=int,
+                        help="Width of the hashed n-gram space (2**bits, default 20); "
+                             "with --warm-start, defaults to the artifact's")
+    args = parser.parse_args()
+
+    if args.stream or args.warm_start or args.features == 'hashed':
+        train_streaming(args.data, args.model, chunksize=args.chunksize, n_jobs=args.jobs,
+                        warm_start=args.warm_start, epochs=max(1, args.epochs),
+                        features=args.features, n_features=2 ** args.hash_bits if args.hash_bits else None)
     else:
-        features.append(1)
-
-    # Feature 5: Length of the URL path
-    features.append(len(urlparse(url).path))
-    
-    # Feature 6: Length of the URL query string
-    features.append(len(urlparse(url).query))
-    
-    # Feature 7: Count of special characters in the URL
-    features.append(len(re.findall(r'[!@#$%^&*(),.?":{}|<>]', url)))
-    
-    # Feature 8: Check for presence of IP address in the URL
-    features.append(has_ip_address(url))
-
-    # Feature 9: Number of digits in the URL
-    features.append(sum(c.isdigit() for c in url))
-    
-    # Feature 10: Number of unique characters in the URL
-    features.append(len(set(url)))
-
-    # Feature 11: Ratio of digits to characters in the URL
-    features.append(sum(c.isdigit() for c in url) / len(url))
-
-    return features
-
-# Load dataset
-df = pd.read_csv('url_dataset.csv')
-
-# Extract features and labels
-X = df['url'].apply(extract_features).tolist()
-y = df['label'].tolist()
-
-# Split the dataset into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-
-# Train the logistic regression model
-model = LogisticRegression(max_iter=1000)
-model.fit(X_train, y_train)
-
-# Evaluate the model
-y_pred = model.predict(X_test)
-print(f"Accuracy: {accuracy_score(y_test, y_pred)}")
-print(classification_report(y_test, y_pred))
-
-# Save the trained model to a file
-joblib.dump(model, 'url_classifier_model.pkl')
\ No newline at end of file
+        train_in_memory(args.data, args.model)
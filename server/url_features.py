@@ -0,0 +1,253 @@
+import re
+from functools import partial
+from math import exp, sqrt
+from urllib.parse import urlparse
+import tldextract
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import StandardScaler
+from sklearn.utils import murmurhash3_32
+
+# List of suspicious words commonly found in phishing URLs
+suspicious_words = ['login', 'secure', 'verify', 'account', 'update', 'bank', 'password', 'admin']
+
+SUSPICIOUS_RE = '|'.join(map(re.escape, suspicious_words))
+IP_RE = r'(?:\d{1,3}\.){3}\d{1,3}'
+SPECIAL_CHARS_RE = r'[!@#$%^&*(),.?":{}|<>]'
+
+# Function to check if the URL contains an IP address
+def has_ip_address(url):
+    ip_pattern = re.compile(IP_RE)
+    return 1 if ip_pattern.search(url) else 0
+
+# Function to check that urlparse accepts the URL (it rejects e.g. an unbalanced '[' in
+# the host); the lexical features can't be computed for URLs it rejects
+def is_parseable(url):
+    try:
+        urlparse(url)
+    except ValueError:
+        return False
+    return True
+
+# Function to extract features from the URL for analysis
+def extract_features(url):
+    features = []
+
+    # Feature 1: Length of the URL
+    features.append(len(url))
+
+    # Feature 2: Number of dots in the domain
+    domain_info = tldextract.extract(url)
+    features.append(domain_info.subdomain.count('.') + domain_info.domain.count('.'))
+
+    # Feature 3: Check for suspicious words in the URL
+    if any(word in url.lower() for word in suspicious_words):
+        features.append(1)
+    else:
+        features.append(0)
+
+    # Feature 4: Check if HTTPS is used (HTTPS adds a layer of security)
+    if urlparse(url).scheme == "https":
+        features.append(0)
+    else:
+        features.append(1)
+
+    # Feature 5: Length of the URL path
+    features.append(len(urlparse(url).path))
+
+    # Feature 6: Length of the URL query string
+    features.append(len(urlparse(url).query))
+
+    # Feature 7: Count of special characters in the URL
+    features.append(len(re.findall(SPECIAL_CHARS_RE, url)))
+
+    # Feature 8: Check for presence of IP address in the URL
+    features.append(has_ip_address(url))
+
+    # Feature 9: Number of digits in the URL
+    features.append(sum(c.isdigit() for c in url))
+
+    # Feature 10: Number of unique characters in the URL
+    features.append(len(set(url)))
+
+    # Feature 11: Ratio of digits to characters in the URL
+    features.append(sum(c.isdigit() for c in url) / len(url))
+
+    return features
+
+# Batched equivalent of extract_features: same 11 columns, computed with
+# vectorized pandas string ops; URLs are parsed once and tldextract runs once per distinct host.
+# Like extract_features, raises ValueError on URLs that fail is_parseable.
+def extract_features_batch(urls):
+    s = pd.Series(urls, dtype=object).astype(str)
+    parsed = [urlparse(u) for u in s]
+    dots = {}
+    domain_dots = []
+    for u, p in zip(s, parsed):
+        # Scheme-less URLs have no netloc; tldextract still finds their host, so use the URL
+        key = p.netloc if p.scheme and p.netloc else u
+        if key not in dots:
+            info = tldextract.extract(key)
+            dots[key] = info.subdomain.count('.') + info.domain.count('.')
+        domain_dots.append(dots[key])
+
+    length = s.str.len().to_numpy(dtype=np.float64)
+    # str.isdigit, not \d: it also counts digits such as superscripts
+    digits = np.array([sum(map(str.isdigit, u)) for u in s], dtype=np.float64)
+    X = np.column_stack([
+        length,
+        np.array(domain_dots, dtype=np.float64),
+        s.str.lower().str.contains(SUSPICIOUS_RE, regex=True).to_numpy(dtype=np.float64),
+        np.array([p.scheme != "https" for p in parsed], dtype=np.float64),
+        np.array([len(p.path) for p in parsed], dtype=np.float64),
+        np.array([len(p.query) for p in parsed], dtype=np.float64),
+        s.str.count(SPECIAL_CHARS_RE).to_numpy(dtype=np.float64),
+        s.str.contains(IP_RE, regex=True).to_numpy(dtype=np.float64),
+        digits,
+        np.array([len(set(u)) for u in s], dtype=np.float64),
+        digits / np.maximum(length, 1),
+    ])
+    return X
+
+# Character n-grams of host, path and query, each tagged with its part so that
+# e.g. "login" in the host and "login" in the path hash to different buckets
+def url_ngrams(url, ngram_range=(3, 5)):
+    try:
+        p = urlparse(url)
+        parts = (('h', (p.hostname or '')), ('p', p.path), ('q', p.query))
+    except ValueError:
+        parts = (('p', url),)
+    lo, hi = ngram_range
+    grams = []
+    for tag, text in parts:
+        if not text:
+            continue
+        text = '^' + text.lower() + '$'
+        for n in range(lo, hi + 1):
+            grams.extend(tag + text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+class HashedUrlFeatures(BaseEstimator, TransformerMixin):
+    """Sparse URL features: hashed host/path/query n-grams plus the scaled lexical features.
+
+    Hashing keeps the width fixed at n_features + 11 with no vocabulary to store; the only
+    fitted state is the scaler for the lexical columns, which supports partial_fit for
+    streaming training. Input is raw URL strings.
+    """
+
+    def __init__(self, n_features=2 ** 20, ngram_range=(3, 5)):
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+
+    def _hasher(self):
+        return HashingVectorizer(
+            analyzer=partial(url_ngrams, ngram_range=tuple(self.ngram_range)),
+            n_features=self.n_features, alternate_sign=False, norm='l2', dtype=np.float32,
+        )
+
+    # Stateless part, safe to run in worker processes: (hashed n-grams, raw lexical features)
+    def extract(self, urls):
+        return self._hasher().transform(urls), extract_features_batch(urls)
+
+    def update(self, raw):
+        if not hasattr(self, 'scaler_'):
+            self.scaler_ = StandardScaler()
+        self.scaler_.partial_fit(raw[1])
+        return self
+
+    def combine(self, raw):
+        hashed, lex = raw
+        lex = self.scaler_.transform(lex).astype(np.float32)
+        return sp.hstack([hashed, sp.csr_matrix(lex)], format='csr')
+
+    def fit(self, urls, y=None):
+        if hasattr(self, 'scaler_'):
+            del self.scaler_
+        return self.update(self.extract(urls))
+
+    def partial_fit(self, urls, y=None):
+        return self.update(self.extract(urls))
+
+    def transform(self, urls):
+        return self.combine(self.extract(urls))
+
+
+class SparseUrlScorer:
+    """Per-URL scoring for a fitted (HashedUrlFeatures, linear classifier) pipeline.
+
+    Hashes n-grams straight into the weight vector and folds the lexical scaler into
+    the weights, so a single URL costs one pass over its n-grams instead of building
+    sparse matrices. Scores match pipeline.decision_function / predict_proba.
+    URLs that fail is_parseable can't be scored and get None.
+    """
+
+    def __init__(self, pipeline):
+        features, clf = pipeline.steps[0][1], pipeline.steps[-1][1]
+        self.n_features = features.n_features
+        self.ngram_range = tuple(features.ngram_range)
+        w = clf.coef_.ravel().astype(np.float64)
+        self.w_hash = w[:self.n_features]
+        w_lex = w[self.n_features:] / features.scaler_.scale_
+        self.w_lex = w_lex
+        self.bias = float(clf.intercept_[0]) - float(np.dot(features.scaler_.mean_, w_lex))
+
+    def _bucket(self, gram):
+        # Same bucketing as sklearn's HashingVectorizer (signed murmurhash3, seed 0)
+        h = murmurhash3_32(gram, seed=0)
+        if h == -2147483648:
+            return (2147483647 - (self.n_features - 1)) % self.n_features
+        return abs(h) % self.n_features
+
+    def decision(self, url):
+        if not is_parseable(url):
+            return None
+        counts = {}
+        for gram in url_ngrams(url, self.ngram_range):
+            idx = self._bucket(gram)
+            counts[idx] = counts.get(idx, 0) + 1
+        norm = sqrt(sum(c * c for c in counts.values())) or 1.0
+        s = sum(self.w_hash[i] * c for i, c in counts.items()) / norm
+        return s + float(np.dot(self.w_lex, extract_features(url))) + self.bias
+
+    def predict_proba(self, url):
+        """Probability that ``url`` is malicious (label 1), or None if it can't be parsed."""
+        d = self.decision(url)
+        if d is None:
+            return None
+        return 1.0 / (1.0 + exp(-d)) if d >= 0 else exp(d) / (1.0 + exp(d))
+
+
+# Odd inputs on which extract_features_batch must agree with extract_features
+PARITY_URLS = [
+    "http://securelogin.bank.com",
+    "a.b.example.com/login",
+    "//x.y.example.co.uk/p",
+    "example.com",
+    "HTTPS://WWW.Example.COM",
+    "http://user:pw@sub.a.example.com:8080/x?y=1",
+    "http://a.b.c.example.com\\evil.com/",
+    "http://x\u00b2\u00b3.example.com/\u0661\u0662\u0663",
+    "http://[::1]/a",
+    "http://192.168.1.1/login.php?id=5",
+    "mailto:admin@bank.com",
+    "http://xn--80ak6aa92e.com/",
+    "http://a..b.example.com/",
+]
+
+
+def check_feature_parity(urls=PARITY_URLS):
+    """Return the URLs whose batched features differ from extract_features."""
+    batch = extract_features_batch(urls)
+    return [u for u, row in zip(urls, batch) if not np.allclose(row, extract_features(u))]
+
+
+if __name__ == "__main__":
+    mismatches = check_feature_parity()
+    for u in mismatches:
+        print(f"feature mismatch: {u!r}\n  row:   {extract_features(u)}\n  batch: {extract_features_batch([u])[0].tolist()}")
+    print(f"{len(PARITY_URLS) - len(mismatches)}/{len(PARITY_URLS)} URLs agree")
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""Concurrent DNS resolution and liveness probing for batch URL scans.
+
+Uses only the stdlib (asyncio) so it runs wherever url_scanner_enhanced.py runs.
+Resolver and connection backends are pluggable, so a batch can be pointed at a
+local stub resolver / HTTP server instead of the real network.
+
+Results use the same shapes as url_scanner_enhanced.check_liveness() and
+resolve_ips(), so server.js can consume them unchanged.
+"""
+
+import sys
+import json
+import asyncio
+import socket
+import ssl
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlparse, urljoin
+
+DEFAULT_CONCURRENCY = 200
+DEFAULT_PER_HOST = 4
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_DNS_TIMEOUT = 3.0
+MAX_HEADER_BYTES = 16384
+# Same limit as urllib's HTTPRedirectHandler
+MAX_REDIRECTS = 10
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+USER_AGENT = "UF-XRAY/1.0"
+
+
+class SystemResolver:
+    """Resolve with the system resolver (blocking getaddrinfo) on a dedicated thread pool.
+
+    asyncio's default executor is small (min(32, cpu + 4) threads) and shared, so a
+    few slow domains would leave every other lookup queued behind them.
+    """
+
+    def __init__(self, max_workers=DEFAULT_CONCURRENCY):
+        self.max_workers = max(1, int(max_workers))
+        self._executor = None
+
+    async def resolve(self, host: str):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="dns")
+        loop = asyncio.get_running_loop()
+        infos = await loop.run_in_executor(
+            self._executor, partial(socket.getaddrinfo, host, None, type=socket.SOCK_STREAM)
+        )
+        ips = []
+        for info in infos:
+            sockaddr = info[4]
+            ip = sockaddr[0] if isinstance(sockaddr, tuple) else None
+            if ip and ip not in ips:
+                ips.append(ip)
+        return ips
+
+    def close(self):
+        # Lookups that are still blocked finish in the background
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class StaticResolver:
+    """Resolve from a fixed {host: [ip, ...]} table (tests, offline runs)."""
+
+    def __init__(self, table):
+        self.table = {k.lower(): list(v) for k, v in (table or {}).items()}
+
+    async def resolve(self, host: str):
+        ips = self.table.get(host.lower())
+        if not ips:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return list(ips)
+
+
+async def open_tcp_connection(ip, port, ssl_context=None, server_hostname=None):
+    """Default connection backend: plain asyncio streams."""
+    return await asyncio.open_connection(
+        ip, port, ssl=ssl_context, server_hostname=server_hostname if ssl_context else None
+    )
+
+
+class _Response:
+    __slots__ = ("status", "keep_alive", "location")
+
+    def __init__(self, status, keep_alive, location=None):
+        self.status = status
+        self.keep_alive = keep_alive
+        self.location = location
+
+
+class Prober:
+    """Batch resolver/prober with a global concurrency cap and per-host pooling.
+
+    - DNS answers are cached per host for the lifetime of the prober.
+    - Idle keep-alive connections are reused for further URLs on the same
+      (scheme, host, port); at most ``per_host`` connections are open per host.
+    - Redirects are followed (up to MAX_REDIRECTS) and the final status is reported,
+      as urllib did; ``final_url`` is set when it differs from the requested URL.
+    - ``timeout`` bounds the whole probe of one URL (connect + request + headers,
+      including redirects); ``dns_timeout`` bounds each resolution.
+    - At most ``dns_concurrency`` lookups (default: ``concurrency``) run at once, and
+      the default resolver has that many threads, so ``dns_timeout`` only starts once
+      a lookup is actually running. A lookup that times out keeps its slot until it
+      really returns, so stuck lookups can't starve the pool.
+    """
+
+    def __init__(self, resolver=None, connector=None, concurrency=DEFAULT_CONCURRENCY,
+                 per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT,
+                 dns_timeout=DEFAULT_DNS_TIMEOUT, ssl_context=None, dns_concurrency=None):
+        self.concurrency = max(1, int(concurrency))
+        self.dns_concurrency = max(1, int(dns_concurrency or self.concurrency))
+        self._own_resolver = resolver is None
+        self.resolver = resolver or SystemResolver(max_workers=self.dns_concurrency)
+        self.connector = connector or open_tcp_connection
+        self.per_host = max(1, int(per_host))
+        self.timeout = timeout
+        self.dns_timeout = dns_timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._dns = {}
+        self._idle = {}
+        self._host_limits = {}
+        self._sem = None
+        self._dns_slots = None
+
+    # -- DNS -------------------------------------------------------------
+
+    async def resolve_ips(self, host: str):
+        """Return the host's addresses ([] on failure), sharing in-flight lookups."""
+        if not host:
+            return []
+        key = host.lower()
+        fut = self._dns.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._resolve(key))
+            self._dns[key] = fut
+        return list(await asyncio.shield(fut))
+
+    async def _resolve(self, host):
+        if self._dns_slots is None:
+            self._dns_slots = asyncio.Semaphore(self.dns_concurrency)
+        await self._dns_slots.acquire()
+        lookup = asyncio.ensure_future(self.resolver.resolve(host))
+        lookup.add_done_callback(self._lookup_done)
+        try:
+            # shield: on timeout the lookup keeps running (a thread can't be interrupted)
+            # and releases its slot when it returns
+            return await asyncio.wait_for(asyncio.shield(lookup), self.dns_timeout)
+        except Exception:
+            return []
+
+    def _lookup_done(self, lookup):
+        self._dns_slots.release()
+        if not lookup.cancelled():
+            lookup.exception()  # mark retrieved; failures are reported as []
+
+    # -- HTTP ------------------------------------------------------------
+
+    def _host_limit(self, key):
+        sem = self._host_limits.get(key)
+        if sem is None:
+            sem = self._host_limits[key] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def _connect(self, key, ips):
+        scheme, host, port = key
+        ctx = self.ssl_context if scheme == "https" else None
+        last_err = None
+        for ip in ips:
+            try:
+                return await self.connector(ip, port, ssl_context=ctx, server_hostname=host)
+            except Exception as e:
+                last_err = e
+        raise last_err or OSError("no addresses to connect to")
+
+    async def _request(self, reader, writer, method, host_header, target, keep_alive):
+        writer.write((
+            f"{method} {target} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            f"User-Agent: {USER_AGENT}\r\n"
+            "Accept: */*\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode("latin-1"))
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("response headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise ValueError(f"malformed status line: {lines[0][:80]!r}")
+        status = int(parts[1])
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        # HEAD responses carry no body, so the connection is immediately reusable
+        # unless the server asked to close it.
+        reusable = (keep_alive and parts[0] != "HTTP/1.0"
+                    and headers.get("connection", "").lower() != "close")
+        return _Response(status, reusable, headers.get("location"))
+
+    async def _probe(self, key, ips, host_header, target):
+        last_err = None
+        # Try HEAD first, then GET fallback
+        for method in ("HEAD", "GET"):
+            try:
+                return await self._follow(method, key, ips, host_header, target)
+            except Exception as e:
+                last_err = e
+        return {"is_live": False, "status_code": None, "error": str(last_err)[:200] or type(last_err).__name__}
+
+    async def _follow(self, method, key, ips, host_header, target):
+        """Request the URL, following redirects like urllib did; report the final status."""
+        start_url = url = f"{key[0]}://{host_header}{target}"
+        for hop in range(MAX_REDIRECTS + 1):
+            resp = await self._send(key, ips, method, host_header, target)
+            if resp.status not in REDIRECT_CODES or not resp.location or hop == MAX_REDIRECTS:
+                break
+            next_url = urljoin(url, resp.location)
+            try:
+                next_key, next_host_header, next_target = self._target(next_url)
+            except ValueError:
+                break
+            if next_key[0] not in ("http", "https"):
+                break
+            if next_key[1] != key[1]:
+                ips = await self.resolve_ips(next_key[1])
+                if not ips:
+                    raise OSError(f"DNS resolution failed for redirect to {next_key[1]}")
+            url, key, host_header, target = next_url, next_key, next_host_header, next_target
+
+        result = {"is_live": True, "status_code": resp.status}
+        if url != start_url:
+            result["final_url"] = url
+        if resp.status >= 300:
+            # urllib raised HTTPError for these; check_liveness() recorded it as a note
+            result["note"] = f"HTTPError on {method}"
+        return result
+
+    async def _send(self, key, ips, method, host_header, target):
+        keep_alive = method == "HEAD"
+        idle = self._idle.get(key)
+        if keep_alive and idle:
+            conn = idle.pop()
+            try:
+                resp = await self._request(*conn, method, host_header, target, keep_alive)
+                self._release(key, conn, resp)
+                return resp
+            except BaseException as e:
+                conn[1].close()
+                if not isinstance(e, Exception):
+                    raise
+                # Stale pooled connection; fall through to a fresh one
+        conn = await self._connect(key, ips)
+        try:
+            resp = await self._request(*conn, method, host_header, target, keep_alive)
+        except BaseException:
+            conn[1].close()
+            raise
+        self._release(key, conn, resp)
+        return resp
+
+    def _release(self, key, conn, resp):
+        if resp.keep_alive:
+            self._idle.setdefault(key, []).append(conn)
+        else:
+            conn[1].close()
+
+    @staticmethod
+    def _target(url):
+        """(pool key, Host header, request target) for ``url``; raises ValueError if malformed."""
+        parsed = urlparse(url)
+        scheme = parsed.scheme.lower()
+        host = (parsed.hostname or "").lower()
+        port = parsed.port or (443 if scheme == "https" else 80)
+        target = parsed.path or "/"
+        if parsed.query:
+            target += "?" + parsed.query
+        return (scheme, host, port), parsed.netloc.rsplit("@", 1)[-1], target
+
+    async def _check(self, key, ips, host_header, target):
+        if not ips:
+            return {"is_live": False, "status_code": None, "error": "DNS resolution failed"}
+        try:
+            return await asyncio.wait_for(self._probe(key, ips, host_header, target), self.timeout)
+        except asyncio.TimeoutError:
+            return {"is_live": False, "status_code": None, "error": f"timed out after {self.timeout}s"}
+
+    async def check_liveness(self, url: str, ips=None):
+        """Probe one URL. ``ips`` skips resolution when already known."""
+        try:
+            key, host_header, target = self._target(url)
+        except ValueError as e:
+            return {"is_live": False, "status_code": None, "error": str(e)[:200]}
+        if ips is None:
+            ips = await self.resolve_ips(key[1])
+        # Waiting for a per-host slot does not count against the probe timeout
+        async with self._host_limit(key):
+            return await self._check(key, ips, host_header, target)
+
+    # -- Batch -----------------------------------------------------------
+
+    async def scan_one(self, url: str):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        try:
+            key, host_header, target = self._target(url)
+        except ValueError as e:
+            # A malformed URL fails on its own instead of aborting the whole batch
+            return {
+                "url": url,
+                "resolved_ips": [],
+                "liveness_check": {"is_live": False, "status_code": None, "error": str(e)[:200]},
+            }
+        # Per-host slot first, so tasks queued behind a busy host don't hold global
+        # slots that URLs on other hosts could be using
+        async with self._host_limit(key):
+            async with self._sem:
+                ips = await self.resolve_ips(key[1])
+                return {
+                    "url": url,
+                    "resolved_ips": ips,
+                    "liveness_check": await self._check(key, ips, host_header, target),
+                }
+
+    async def scan_many(self, urls):
+        """Resolve and probe every URL; results are returned in input order."""
+        try:
+            return await asyncio.gather(*(self.scan_one(u) for u in urls))
+        finally:
+            self.close()
+
+    def close(self):
+        for conns in self._idle.values():
+            for _, writer in conns:
+                writer.close()
+        self._idle.clear()
+        if self._own_resolver:
+            self.resolver.close()
+
+
+def probe_urls(urls, **kwargs):
+    """Synchronous entry point: run a Prober over ``urls`` and return its results."""
+    return asyncio.run(Prober(**kwargs).scan_many(list(urls)))
+
+
+if __name__ == "__main__":
+    # Usage: python url_probe.py [urls.txt]   (one URL per line; stdin if omitted)
+    src = open(sys.argv[1], encoding="utf-8") if len(sys.argv) > 1 else sys.stdin
+    with src:
+        batch = [line.strip() for line in src if line.strip()]
+    for result in probe_urls(batch):
+        print(json.dumps(result, separators=(",", ":")))
+    sys.exit(0)
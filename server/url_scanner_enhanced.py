@@ -106,7 +106,8 @@ def resolve_ips(host: str):
         return []
 
 
-def main(u: str):
+def main(u: str, probe=None):
+    """Scan one URL. ``probe`` is a precomputed url_probe result for batch runs."""
     if not u or not u.startswith(("http://", "https://")):
         return {"error": "invalid_url", "message": "Must start with http(s)://"}
     a = analyze_structure(u)
@@ -121,16 +122,31 @@ def main(u: str):
         "threat_level": level,
         "structure_analysis": a,
         "pattern_detection": p,
-        "liveness_check": check_liveness(u),
-        "resolved_ips": resolve_ips(host),
+        "liveness_check": probe["liveness_check"] if probe else check_liveness(u),
+        "resolved_ips": probe["resolved_ips"] if probe else resolve_ips(host),
         "ssl_certificate": {"skipped": True},
     }
 
 
+def scan_batch(urls, **probe_opts):
+    """Scan many URLs, resolving and probing them concurrently via url_probe."""
+    from url_probe import probe_urls
+
+    valid = [u for u in urls if u.startswith(("http://", "https://"))]
+    probes = {r["url"]: r for r in probe_urls(dict.fromkeys(valid), **probe_opts)}
+    return [main(u, probes.get(u)) if u in probes else main(u) for u in urls]
+
+
 if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--batch":
+        # One URL per line in the input file; one JSON result per output line
+        with open(sys.argv[2], encoding="utf-8") as f:
+            batch = [line.strip() for line in f if line.strip()]
+        for result in scan_batch(batch):
+            print(json.dumps(result, separators=(",", ":")))
+        sys.exit(0)
     if len(sys.argv) != 2:
-        print(json.dumps({"error": "usage", "message": "python url_scanner_enhanced.py <url>"}))
+        print(json.dumps({"error": "usage", "message": "python url_scanner_enhanced.py <url> | --batch <urls.txt>"}))
         sys.exit(1)
     print(json.dumps(main(sys.argv[1]), separators=(",", ":")))
     sys.exit(0)
-